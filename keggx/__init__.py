@@ -1,9 +1,3 @@
 #!/usr/bin/env python3
 
 from .keggx import KEGG
-
-
-# Set font style
-import matplotlib
-matplotlib.rcParams['font.sans-serif'] = "arial"
-matplotlib.rcParams['font.family'] = "arial"
\ No newline at end of file
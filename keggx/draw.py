@@ -2,8 +2,7 @@
 
 import numpy as np
 
-import matplotlib
-import matplotlib.pyplot as plt
+from functools import lru_cache
 
 
 class Node: 
@@ -13,59 +12,131 @@ class Node:
 		for key,val in attribs.items():
 			setattr(self, key, val)
 
-	@property
-	def anchor(self): 
 		# Bottom left corner
 		if self.shape == 'circle': 
-			return np.array([self.x, self.y])
+			ax, ay = self.x, self.y
 		else: 
-			return np.array([self.x-self.width/2, self.y-self.height/2])
+			ax, ay = self.x-self.width/2, self.y-self.height/2
+
+		# Anchor and center, computed once. Side midpoints are only computed if asked for. 
+		self._anchor = np.array([ax, ay], dtype=np.float64)
+		self._center = np.array([ax+self.width/2, ay+self.height/2], dtype=np.float64)
+		self._sides  = None
+
+	@property
+	def anchor(self): 
+		return self._anchor
 
 	@property
 	def center(self): 
-		x,y = self.anchor
-		return np.array([x+self.width/2, y+self.height/2])
+		return self._center
+
+	@property
+	def sides(self): 
+		# Stacked (left, right, top, bottom) midpoints, computed on first access. `KEGG.view` uses `node_sides` instead. 
+		if self._sides is None: 
+			(ax, ay), w, h = self._anchor, self.width, self.height
+			self._sides = np.array([[ax, ay+h/2], [ax+w, ay+h/2], [ax+w/2, ay+h], [ax+w/2, ay]], dtype=np.float64)
+		return self._sides
 
 	@property
 	def left(self):
-		x,y = self.anchor
-		return np.array([x, y+self.height/2])
+		return self.sides[0]
 
 	@property
 	def right(self):
-		x,y = self.anchor
-		return np.array([x+self.width, y+self.height/2])
+		return self.sides[1]
 
 	@property
 	def top(self):
-		x,y = self.anchor
-		return np.array([x+self.width/2, y+self.height])
+		return self.sides[2]
 
 	@property
 	def bottom(self):
-		x,y = self.anchor
-		return np.array([x+self.width/2, y])
+		return self.sides[3]
 	
 
 
 
 def shortest_arrow(source, target): 
 
-	source_pos, target_pos = None, None
-	min_distance = np.inf
+	source_sides, target_sides = source.sides, target.sides
+
+	# (4,4) matrix of squared distances between every pair of sides
+	distances = ((source_sides[:,None,:] - target_sides[None,:,:])**2).sum(-1)
+	i,j = np.unravel_index(distances.argmin(), distances.shape)
+
+	return source_sides[i], target_sides[j]
+
+
+def node_sides(x, y, width, height, is_circle): 
+	"""
+	Vectorized equivalent of `Node.sides` for arrays of node geometries. 
+
+	Arguments: 
+		x, y, width, height (numpy.ndarray): node positions and dimensions, shape (N,)
+		is_circle (numpy.ndarray): boolean mask of circular nodes, which are anchored at (x, y)
+
+	Returns: 
+		numpy.ndarray: (left, right, top, bottom) midpoints of each node, shape (N,4,2)
+	"""
 
-	for pos1 in [source.left, source.right, source.top, source.bottom]: 
-		for pos2 in [target.left, target.right, target.top, target.bottom]: 
-			distance = ((pos1 - pos2)**2).sum()
-			if distance < min_distance: 
-				source_pos, target_pos = pos1, pos2
-				min_distance = distance
+	# Bottom left corner
+	ax = np.where(is_circle, x, x-width/2)
+	ay = np.where(is_circle, y, y-height/2)
 
-	return source_pos, target_pos
+	return np.stack([
+		np.stack([ax, ay+height/2], axis=-1), 
+		np.stack([ax+width, ay+height/2], axis=-1), 
+		np.stack([ax+width/2, ay+height], axis=-1), 
+		np.stack([ax+width/2, ay], axis=-1)
+	], axis=1).astype(np.float64)
+
+
+def shortest_arrows(source_sides, target_sides): 
+	"""
+	Vectorized equivalent of `shortest_arrow` for many edges at once. 
+
+	Arguments: 
+		source_sides, target_sides (numpy.ndarray): side midpoints of each edge's source and target, shape (E,4,2)
+
+	Returns: 
+		numpy.ndarray: source positions, shape (E,2)
+		numpy.ndarray: target positions, shape (E,2)
+	"""
+
+	# (E,4,4) squared distances between every pair of sides of each edge
+	distances = ((source_sides[:,:,None,:] - target_sides[:,None,:,:])**2).sum(-1)
+	i,j = np.divmod(distances.reshape(-1, 16).argmin(axis=1), 4)
+	edges = np.arange(len(distances))
+
+	return source_sides[edges, i], target_sides[edges, j]
+
+
+@lru_cache(maxsize=1)
+def _import_pyplot(): 
+	"""
+	Imports matplotlib on first use, so that parsing pathways does not pay for it. The package font 
+	style is set at the same time. 
+
+	Returns: 
+		module: matplotlib.pyplot
+	"""
+
+	import matplotlib
+	import matplotlib.pyplot as plt
+
+	# Set font style
+	matplotlib.rcParams['font.sans-serif'] = "arial"
+	matplotlib.rcParams['font.family'] = "arial"
+
+	return plt
 
 
 def set_grid(xlim, ylim, scale=1): 
 
+	plt = _import_pyplot()
+
 	x_min, x_max = xlim
 	y_min, y_max = ylim
 	x_pad = (x_max - x_min) * 0.1
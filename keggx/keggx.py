@@ -4,62 +4,337 @@ import numpy as np
 import pandas as pd
 import networkx as nx
 
-import xml.etree.ElementTree as ET
+try: 
+	from lxml import etree as ET
+except ImportError: 
+	import xml.etree.ElementTree as ET
+
+from io import BytesIO
+from multiprocessing import Pool
+from itertools import compress
+from functools import lru_cache
+
+try: 
+	from functools import cached_property
+except ImportError: 
+	# Python < 3.8: minimal equivalent that stores the computed value on the instance
+	class cached_property: 
+
+		def __init__(self, func): 
+			self.func = func
+			self.name = func.__name__
+			self.__doc__ = func.__doc__
+
+		def __set_name__(self, owner, name): 
+			self.name = name
+
+		def __get__(self, instance, owner=None): 
+			if instance is None: return self
+			value = instance.__dict__[self.name] = self.func(instance)
+			return value
 
-from itertools import combinations, product
 import pkg_resources
 
-import matplotlib
-import matplotlib.pyplot as plt
-import seaborn as sns
-
-from .draw import Node, set_grid, shortest_arrow
+from .draw import Node, set_grid, node_sides, shortest_arrows
 
 
 KEGG_COMPOUND_FILE = pkg_resources.resource_filename('keggx', 'KEGG_compound_ids.txt')
+KEGG_KGML_URL = 'http://rest.kegg.jp/get/{}/kgml'
+
+# Relation types converted into edges
+RELATION_TYPES = frozenset(['ECrel', 'PPrel', 'GErel', 'PCrel'])
+
+# Edge attribute updates for each KGML relation subtype, grouped into the stages in which they are applied
+EDGE_UPDATES_BY_STAGE = (
+	{
+		'binding/association': { 'effect': 2 },
+		'protein complex':	   { 'effect': 2 }, # not standard type, but including for clarity
+		'bidirected':		   { 'effect': 2 }, # not standard type, but including for clarity
+		'dissociation':		   { 'effect': 1 },
+		'missing interaction': { 'effect': 0 },
+		'indirect effect':	   { 'effect': 1, 'indirect': 1 },
+	},
+	{
+		'phosphorylation':	 { 'effect': 1, 'modification': "+p" },
+		'dephosphorylation': { 'effect': 1, 'modification': "-p" },
+		'glycosylation':	 { 'effect': 1, 'modification': "+g" },
+		'ubiquitination':	 { 'effect': 1, 'modification': "+u" },
+		'methylation':		 { 'effect': 1, 'modification': "+m" },
+	},
+	{
+		'activation': { 'effect':  1 },
+		'inhibition': { 'effect': -1 },
+		'expression': { 'effect':  1, 'modification': 'e' },
+		'repression': { 'effect': -1, 'modification': 'e' },
+	},
+)
+
+# The same updates keyed by interaction, each with the stage it belongs to
+INTERACTION_UPDATES = { interaction: (stage, updates) for stage,edge_updates in enumerate(EDGE_UPDATES_BY_STAGE) for interaction,updates in edge_updates.items() }
+
+
+@lru_cache(maxsize=None)
+def _resolve_interactions(interactions): 
+	"""
+	Resolves a combination of KGML interactions into edge attributes. Few distinct combinations occur, 
+	so results are cached. 
+
+	Arguments: 
+		interactions (tuple): interaction names, e.g. subtypes of a relation
+
+	Returns: 
+		tuple: `effect`, `indirect`, and `modification` attributes
+	"""
+
+	# Attribute `effect` takes values 0 (---), 1 (-->), 2 (<->), or -1 (--|) to indicate cases where
+	# orientation is unknown, the edge is activating, the edge is bidirectional (protein complex), or the edge is inhibitory.
+	# Perhaps add `binding` as an attribute? Interactions? 
+	edge_attributes = { 'effect': 0, 'indirect': 0, 'modification': "" }
+
+	# Attributes are updated in stages, since descriptors examined in later stages are more specific 
+	# than those in earlier stages, and should be used to overwrite them. Matching interactions are 
+	# looked up in one pass, then applied in stage order (ties keep their order in `interactions`). 
+	matched_updates = [INTERACTION_UPDATES[interaction] for interaction in interactions if interaction in INTERACTION_UPDATES]
+	for _,updates in sorted(matched_updates, key=lambda match: match[0]): 
+		edge_attributes.update(updates)
+
+	return edge_attributes['effect'], edge_attributes['indirect'], edge_attributes['modification']
+
+
+def _undirected_edge(source, target): 
+	"""
+	Key of an edge that is the same in both directions. Ids are ordered into a (smaller id, larger id) pair, 
+	which hashes faster than a set. 
+
+	Arguments: 
+		source, target (str): node ids
+
+	Returns: 
+		tuple, or frozenset for ids that cannot be ordered, such as a missing id (`None`)
+	"""
+
+	try: 
+		return (source, target) if source < target else (target, source)
+	except TypeError: 
+		return frozenset((source, target))
+
+
+@lru_cache(maxsize=1)
+def _load_compound_ids(): 
+	"""
+	Reads the KEGG compound id table once per session. Each line maps a compound (e.g. `cpd:C00002`)
+	to a semicolon-separated list of aliases, the first of which is the common name. 
+
+	Returns: 
+		dict: compound id to common name
+		dict: compound id to aliases
+	"""
+
+	name_map, alias_map = {}, {}
+
+	with open(KEGG_COMPOUND_FILE, encoding='utf-8') as f: 
+		for line in f: 
+			compound_id, aliases = line.rstrip('\n').split('\t', 1)
+			compound_id = compound_id.split(':', 1)[1]
+
+			name_map[compound_id]  = aliases.split(';', 1)[0]
+			alias_map[compound_id] = aliases
+
+	return name_map, alias_map
+
+
+@lru_cache(maxsize=1)
+def _get_session(): 
+	"""
+	Imports `requests` on first download and returns a shared HTTP session, so that fetching many 
+	pathways reuses one connection. 
+
+	Returns: 
+		requests.Session
+	"""
+
+	import requests
+
+	return requests.Session()
+
+
+@lru_cache(maxsize=1)
+def _get_gene_palette(): 
+	"""
+	Builds the lookup of gene colors used by `KEGG.view`: 256 shades of coolwarm followed by grey for 
+	genes without values. Seaborn is only imported here. 
+
+	Returns: 
+		numpy.ndarray: hex colors
+	"""
+
+	import seaborn as sns
+
+	return np.array(list(sns.color_palette("coolwarm", 256).as_hex()) + ['#b3b3b3'], dtype=object)
+
+
+@lru_cache(maxsize=128)
+def _fetch_kgml(pathway_id): 
+	"""
+	Downloads the KGML file for a pathway from the KEGG REST API. Repeated requests for the same 
+	pathway are served from memory. 
+
+	Arguments: 
+		pathway_id (str): KEGG pathway id, e.g. `hsa04010`
+
+	Returns: 
+		bytes: raw KGML, passed as bytes so the parser can handle decoding itself
+	"""
+
+	response = _get_session().get(KEGG_KGML_URL.format(pathway_id))
+	response.raise_for_status()
+
+	return response.content
 
 
 class KEGG:
 
 	def __init__(self, pathway_id=None, KGML_file=None):
 
-		# Set pathway metadata attributes
+		# DataFrame columns
+		self.node_columns = ['id', 'name', 'aliases', 'type', 'x', 'y', 'height', 'width', 'shape', 'bgcolor', 'fgcolor']
+		self.edge_columns = ['source', 'target', 'effect', 'indirect', 'modification', 'type']
+
+		# Parse pathway metadata and elements
 		if pathway_id is not None: 
-			import requests
-			self.root = ET.fromstring(requests.get('http://rest.kegg.jp/get/{}/kgml'.format(pathway_id)).text)
+			self._parse_KGML(BytesIO(_fetch_kgml(pathway_id)))
 		elif KGML_file is not None:
-			self.root = ET.parse(KGML_file).getroot()
+			self._parse_KGML(KGML_file)
 		else: 
 			print('Need to specify `pathway_id` or `KGML_file`.')
 
-		self.name   = self.root.get('name') 
-		self.org	= self.root.get('org') 
-		self.number = self.root.get('number')
-		self.title  = self.root.get('title') 
-		self.link   = self.root.get('link')
 
-		# Each of the 3 types of elements allowed in KGML files
-		self._entries   = self.root.findall('entry')
-		self._reactions = self.root.findall('reaction')
-		self._relations = self.root.findall('relation')
-		self._groups	= self.root.findall('.//entry[@type="group"]')
+	@classmethod
+	def from_files(cls, KGML_files, processes=None): 
+		"""
+		Parses many KGML files in parallel, one pathway per worker process. 
 
-		# DataFrame columns
-		self.node_columns = ['id', 'name', 'aliases', 'type', 'x', 'y', 'height', 'width', 'shape', 'bgcolor', 'fgcolor']
-		self.edge_columns = ['source', 'target', 'effect', 'indirect', 'modification', 'type']
+		Arguments: 
+			KGML_files (list): paths to KGML files
+			processes (int): number of worker processes, defaults to the number of CPUs
+
+		Returns: 
+			list: `KEGG` instances, in the same order as `KGML_files`
+		"""
+
+		with Pool(processes) as pool: 
+			return pool.map(_load_KGML_file, KGML_files)
+
+
+	#### PARSING ####
+
+	def _parse_KGML(self, source): 
+		"""
+		Streams a KGML file, keeping only the attributes needed to build the graph. Each entry, reaction and 
+		relation element is cleared as soon as it has been read. Under lxml, elements already read are also 
+		removed from the tree, so memory stays flat; the stdlib parser keeps the emptied elements attached 
+		to the root until parsing ends. 
+
+		Arguments: 
+			source (str or file): path to, or file object of, a KGML file. File objects may be opened in 
+				binary or text mode. 
+		"""
+
+		# lxml only reads bytes from file objects, so text streams are re-encoded, overriding any declared encoding 
+		is_lxml = ET.__name__ == 'lxml.etree'
+		iterparse_options = {}
+		if is_lxml and hasattr(source, 'read') and isinstance(source.read(0), str): 
+			source, iterparse_options = BytesIO(source.read().encode('utf-8')), { 'encoding': 'utf-8' }
+
+		# Each of the 3 types of elements allowed in KGML files, read into tuples as they are parsed
+		self._entry_rows, self._groups, self._reactions, self._relations = [], [], [], []
+
+		for _,element in ET.iterparse(source, events=('end',), **iterparse_options): 
+
+			if element.tag == 'entry': 
+				# Entry attributes and those of its `graphics` child, ordered like `self.node_columns`. Graphics `name` and `type` 
+				# are stored as `aliases` and `shape`, `name` is derived later, and coordinates are parsed as floats (NaN if missing). 
+				entry_id, entry_type = element.get('id'), element.get('type')
+				graphics = next((child.attrib for child in element if child.tag == 'graphics'), {})
+				self._entry_rows.append((
+					entry_id, None, graphics.get('name', ''), entry_type, 
+					float(graphics.get('x', 'nan')), float(graphics.get('y', 'nan')), float(graphics.get('height', 'nan')), float(graphics.get('width', 'nan')), 
+					graphics.get('type'), graphics.get('bgcolor'), graphics.get('fgcolor')
+				))
+				# Groups are also kept with the ids of their components
+				if entry_type == 'group': 
+					self._groups.append((entry_id, [child.get('id') for child in element if child.tag == 'component']))
+
+			elif element.tag == 'reaction': 
+				# Substrates and products are read from the reaction's children in a single pass
+				substrate_ids, product_ids = [], []
+				for child in element: 
+					if child.tag == 'substrate': substrate_ids.append(child.get('id'))
+					elif child.tag == 'product': product_ids.append(child.get('id'))
+				self._reactions.append((element.get('id'), element.get('name'), element.get('type'), substrate_ids, product_ids))
+
+			elif element.tag == 'relation': 
+				subtypes = [(child.get('name'), child.get('value')) for child in element if child.tag == 'subtype']
+				self._relations.append((element.get('entry1'), element.get('entry2'), element.get('type'), subtypes))
+
+			elif element.tag == 'pathway': 
+				# The root element ends last, and holds the pathway metadata
+				self.name   = element.get('name') 
+				self.org	= element.get('org') 
+				self.number = element.get('number')
+				self.title  = element.get('title') 
+				self.link   = element.get('link')
+				continue
+
+			else: 
+				# Children such as `graphics` or `subtype` are read along with their parent element
+				continue
+
+			element.clear()
+			# lxml keeps cleared elements attached to the root, so those read before this one are removed as well
+			if is_lxml: 
+				while element.getprevious() is not None: del element.getparent()[0]
+
+
+
+	#### GRAPH ATTRIBUTES ####
 
-		# Graph attribute DataFrames
-		self.entry_attributes_df = self._get_entry_attributes_as_dataframe()
-		self.node_attributes_df  = self._get_node_attributes_as_dataframe()
-		self.edge_attributes_df  = self._get_edge_attributes_as_dataframe()
+	# Graph attribute DataFrames and the graph itself are computed on first access. The parsed rows 
+	# behind the entry and edge tables are released once those tables are built. 
 
-		self.inferred_edge_attributes_df = self._infer_gene_edges_from_reactions()
+	@cached_property
+	def entry_attributes_df(self): 
 
-		# Create graph
-		self.G_kegg = nx.from_pandas_edgelist(self.edge_attributes_df, 'source', 'target', edge_attr=True, create_using=nx.DiGraph())
-		self.G_kegg.add_nodes_from(self.entry_attributes_df.index)
-		nx.set_node_attributes(self.G_kegg, self.entry_attributes_df.to_dict('index'))
+		entry_attributes_df = self._get_entry_attributes_as_dataframe()
+		del self._entry_rows
 
+		return entry_attributes_df
+
+	@cached_property
+	def node_attributes_df(self): 
+		return self._get_node_attributes_as_dataframe()
+
+	@cached_property
+	def edge_attributes_df(self): 
+
+		edge_attributes_df = self._get_edge_attributes_as_dataframe()
+		del self._reactions, self._relations, self._groups
+
+		return edge_attributes_df
+
+	@cached_property
+	def inferred_edge_attributes_df(self): 
+		return self._infer_gene_edges_from_reactions()
+
+	@cached_property
+	def G_kegg(self): 
+
+		graph = nx.DiGraph()
+		graph.add_edges_from(self._get_edges(self.edge_attributes_df))
+		graph.add_nodes_from(self.entry_attributes_df.index)
+		nx.set_node_attributes(graph, self.entry_attributes_df.to_dict('index'))
+
+		return graph
 
 
 	#### NODES ####
@@ -73,26 +348,25 @@ class KEGG:
 			pandas.DataFrame: entry attributes
 		"""
 
-		entry_type_df	  = pd.DataFrame([entry.attrib for entry in self._entries]).drop(columns=['name', 'link'], errors='ignore')
-		entry_graphics_df = pd.DataFrame([entry.find('graphics').attrib for entry in self._entries]).rename(columns={'name': 'aliases', 'type': 'shape'})
-
-		entry_attributes_df = pd.concat([entry_type_df, entry_graphics_df], axis=1)
-		entry_attributes_df['aliases'].fillna('', inplace=True)
-		entry_attributes_df['name'] = entry_attributes_df['aliases'].apply(lambda x: x.split(', ')[0].rstrip('.'))
-		entry_attributes_df = entry_attributes_df[self.node_columns].set_index('id')
+		# Entry rows were read while parsing, ordered like `self.node_columns`
+		entry_attributes_df = pd.DataFrame(self._entry_rows, columns=self.node_columns)
+		entry_attributes_df['name'] = entry_attributes_df['aliases'].str.split(', ', n=1).str[0].str.rstrip('.')
+		entry_attributes_df = entry_attributes_df.set_index('id')
 
 		# Check if compound path exists: 
 		if True: 
-			compound_ids = pd.read_csv(KEGG_COMPOUND_FILE, names=['name', 'aliases'], sep='\t')
-			compound_ids.index = compound_ids['name'].apply(lambda x: x.split(':')[1])
-			compound_ids['name'] = compound_ids['aliases'].apply(lambda x: x.split(';')[0])
-
-			compound_rows = entry_attributes_df['name'].isin(compound_ids.index)
-			entry_attributes_df.loc[compound_rows, ['name', 'aliases']] = compound_ids.loc[entry_attributes_df[compound_rows]['name']].values
+			name_map, alias_map = _load_compound_ids()
 
-			# entry_attributes_df[entry_attributes_df['name'].isin(compound_ids.index)]['name'].apply(lambda x: compound_ids.loc[x])
+			# Replace compound ids (e.g. `C00002`) with their common name and aliases, using plain dict lookups on the raw values
+			entry_names, entry_aliases = entry_attributes_df['name'].to_numpy(), entry_attributes_df['aliases'].to_numpy()
+			entry_attributes_df['aliases'] = np.array([alias_map.get(name, aliases) for name,aliases in zip(entry_names, entry_aliases)], dtype=object)
+			entry_attributes_df['name']	= np.array([name_map.get(name, name) for name in entry_names], dtype=object)
 
-		entry_attributes_df[['x', 'y', 'height', 'width']] = entry_attributes_df[['x', 'y', 'height', 'width']].astype(float)
+		# Low-cardinality string attributes are stored as categoricals. Coordinates are already floats, except in 
+		# empty pathways, where no values are available to infer them from. 
+		entry_dtypes = { column: 'category' for column in ['type', 'shape', 'bgcolor', 'fgcolor'] }
+		entry_dtypes.update({ column: float for column in ['x', 'y', 'height', 'width'] })
+		entry_attributes_df = entry_attributes_df.astype(entry_dtypes)
 
 		return entry_attributes_df
 
@@ -124,20 +398,27 @@ class KEGG:
 		edge_attributes_list	 = self._get_edge_attributes_from_reactions()
 		relation_attributes_list = self._get_edge_attributes_from_relations()
 
+		# Undirected edges in `edge_attributes` as a set, so membership checks are constant time
+		existing_edges = { _undirected_edge(source, target) for source,target,*_ in edge_attributes_list }
+
 		# Prioritize reaction edges over relations by populating `edge_attributes` with reaction edges first
-		for relation_attributes in relation_attributes_list: 
+		for relation_attributes in relation_attributes_list:
 
-			# Get edges in `edge_attributes` as a list of sets
-			existing_edges = [set([edge_attributes['source'], edge_attributes['target']]) for edge_attributes in edge_attributes_list]
+			edge = _undirected_edge(*relation_attributes[:2])
 
 			# Add edge attribute if the edge has not been seen before
-			if set([relation_attributes['source'], relation_attributes['target']]) not in existing_edges: 
+			if edge not in existing_edges:
 
+				existing_edges.add(edge)
 				edge_attributes_list.append(relation_attributes)
 
-		# Convert to DataFrame and replace group edges 
-		edge_attributes_df = pd.DataFrame(edge_attributes_list, columns=self.edge_columns)
-		edge_attributes_df = self._replace_group_edges(edge_attributes_df)
+		# Replace group edges on a plain object array, then convert to a DataFrame once
+		edge_values = np.array(edge_attributes_list, dtype=object).reshape(-1, len(self.edge_columns))
+		edge_values = self._replace_group_edges(edge_values)
+		edge_attributes_df = pd.DataFrame(edge_values, columns=self.edge_columns).infer_objects()
+
+		# Compact dtypes for the small integer codes and low-cardinality strings
+		edge_attributes_df = edge_attributes_df.astype({ 'effect': 'int8', 'indirect': 'int8', 'modification': 'category', 'type': 'category' })
 
 		return edge_attributes_df
 
@@ -146,103 +427,118 @@ class KEGG:
 		# If A<-->B, this function splits into two relations: A-->B and B-->A
 		if len(edge_attributes_df) == 0: return edge_attributes_df
 
-		reverse_edges_df = edge_attributes_df[edge_attributes_df['effect'].isin([-2,0,2])].rename(columns={ 'source': 'target', 'target': 'source'})
-		directed_edge_attributes_df = pd.concat([edge_attributes_df, reverse_edges_df], sort=False)
+		is_undirected = edge_attributes_df['effect'].isin([-2,0,2]).values
+
+		# Undirected rows are repeated after all edges, keeping column dtypes, then their `source` and `target` are swapped
+		num_edges = len(edge_attributes_df)
+		rows = np.concatenate([np.arange(num_edges), np.flatnonzero(is_undirected)])
+		directed_edge_attributes_df = edge_attributes_df.iloc[rows].reset_index(drop=True)
+		directed_edge_attributes_df.loc[num_edges:, ['source', 'target']] = directed_edge_attributes_df.loc[num_edges:, ['target', 'source']].values
 
 		return directed_edge_attributes_df
 
 
-	def _infer_gene_edges_from_reactions(self): 
+	def _get_edges(self, edge_attributes_df): 
+		"""
+		Converts an edge attribute DataFrame into edges ready for `networkx.DiGraph.add_edges_from`, reading 
+		each column once instead of iterating over rows. 
 
-		compound_ids = self.node_attributes_df[self.node_attributes_df['type'] == 'compound'].index
+		Arguments: 
+			edge_attributes_df (pandas.DataFrame): edge attributes
 
-		directed_edge_attributes_df = self._get_directed_edge_attributes_as_dataframe(self.edge_attributes_df)
+		Returns: 
+			list: (source, target, attributes) tuples
+		"""
 
-		inferred_edges = []
-		oriented_edge_attributes_df = directed_edge_attributes_df[directed_edge_attributes_df['effect'] != 0]
+		attribute_columns = [column for column in edge_attributes_df.columns if column not in ['source', 'target']]
+		attributes = [dict(zip(attribute_columns, values)) for values in zip(*[edge_attributes_df[column].tolist() for column in attribute_columns])]
 
-		for compound_id in compound_ids: 
-			sourced_compounds_df  = oriented_edge_attributes_df[oriented_edge_attributes_df['source'] == compound_id]
-			targeted_compounds_df = oriented_edge_attributes_df[oriented_edge_attributes_df['target'] == compound_id]
+		return list(zip(edge_attributes_df['source'].tolist(), edge_attributes_df['target'].tolist(), attributes))
 
-			source_nodes = targeted_compounds_df['source'].tolist()
-			target_nodes = sourced_compounds_df['target'].tolist()
 
-			for source, target in product(source_nodes, target_nodes): 
+	def _get_directed_edges(self, edge_attributes_df): 
+		"""
+		Same as `_get_directed_edge_attributes_as_dataframe`, but returns edges ready for `networkx.DiGraph.add_edges_from`
+		without building an intermediate DataFrame. 
 
-				inferred_edges.append(self._populate_edge_attributes(source, target, "inferred_rxn", ['activation']))
+		Arguments: 
+			edge_attributes_df (pandas.DataFrame): edge attributes
 
-		inferred_edges_df = pd.DataFrame(inferred_edges, columns=self.edge_columns).drop_duplicates()
+		Returns: 
+			list: (source, target, attributes) tuples
+		"""
 
-		# Remove duplicated edges, consolidate bidirectional edges
-		edgelist_as_sets = [set(pair) for pair in inferred_edges_df[['source', 'target']].values]
-		inferred_edges_df['effect'] = [edgelist_as_sets.count(pair) for pair in edgelist_as_sets]
-		inferred_edges_df = inferred_edges_df[[False if pair in edgelist_as_sets[:i] else True for i,pair in enumerate(edgelist_as_sets)]]
+		edges = self._get_edges(edge_attributes_df)
+		is_undirected = edge_attributes_df['effect'].isin([-2,0,2]).values
 
-		return inferred_edges_df
+		# Reversed edges follow all edges, with their attributes repeated
+		return edges + [(target, source, attributes) for source,target,attributes in compress(edges, is_undirected)]
 
 
-	def _populate_edge_attributes(self, source, target, edge_type, interactions): 
+	def _infer_gene_edges_from_reactions(self): 
 
-		# Attribute `effect` takes values 0 (---), 1 (-->), 2 (<->), or -1 (--|) to indicate cases where
-		# orientation is unknown, the edge is activating, the edge is bidirectional (protein complex), or the edge is inhibitory.
-		# Perhaps add `binding` as an attribute? Interactions? 
-		edge_attributes = { 'source': source, 'target': target, 'type': edge_type, 
-							'effect': 0, 'indirect': 0, 'modification': "" }
+		compound_ids = self.node_attributes_df[self.node_attributes_df['type'] == 'compound'].index
+
+		directed_edge_attributes_df = self._get_directed_edge_attributes_as_dataframe(self.edge_attributes_df)
 
-		# Attributes must be updated in two steps, since descriptors examined in the second loop
-		# are more specific than those in the first, and should be used to overwrite them. 
-		for interaction in interactions: 
+		oriented_edge_attributes_df = directed_edge_attributes_df[directed_edge_attributes_df['effect'] != 0]
+		edge_sources = oriented_edge_attributes_df['source'].values
+		edge_targets = oriented_edge_attributes_df['target'].values
+
+		# Edges into and out of each compound, with inbound edges ordered by compound so that the merge below 
+		# pairs every source of a compound with every target of it, one compound at a time
+		into_compound = np.isin(edge_targets, compound_ids)
+		inbound = pd.DataFrame({ 'compound': edge_targets[into_compound], 'source': edge_sources[into_compound] })
+		inbound = inbound.iloc[np.argsort(compound_ids.get_indexer(inbound['compound']), kind='stable')]
+		out_of_compound = np.isin(edge_sources, compound_ids)
+		outbound = pd.DataFrame({ 'compound': edge_sources[out_of_compound], 'target': edge_targets[out_of_compound] })
+
+		# Inferred edges are all activations, so their attributes are resolved once
+		effect, indirect, modification = _resolve_interactions(('activation',))
+
+		inferred_edges_df = inbound.merge(outbound, on='compound', sort=False)
+		inferred_edges_df = pd.DataFrame({ 
+			'source': inferred_edges_df['source'].values, 
+			'target': inferred_edges_df['target'].values, 
+			'effect': effect, 
+			'indirect': indirect, 
+			'modification': modification, 
+			'type': "inferred_rxn" 
+		}, columns=self.edge_columns).drop_duplicates()
 
-			if   interaction == 'binding/association': edge_attributes.update({ 'effect': 2 })
-			elif interaction == 'protein complex':	   edge_attributes.update({ 'effect': 2 }) # not standard type, but including for clarity
-			elif interaction == 'bidirected':	   	   edge_attributes.update({ 'effect': 2 }) # not standard type, but including for clarity
-			elif interaction == 'dissociation': 	   edge_attributes.update({ 'effect': 1 })
-			elif interaction == 'missing interaction': edge_attributes.update({ 'effect': 0 })
-			elif interaction == 'indirect effect':	   edge_attributes.update({ 'effect': 1, 'indirect': 1 })
-			else: pass
+		# Remove duplicated edges, consolidate bidirectional edges
+		edgelist_as_sets = pd.Series([frozenset(pair) for pair in inferred_edges_df[['source', 'target']].values], index=inferred_edges_df.index, dtype=object)
+		inferred_edges_df['effect'] = edgelist_as_sets.groupby(edgelist_as_sets, sort=False).transform('size')
+		inferred_edges_df = inferred_edges_df[~edgelist_as_sets.duplicated()]
 
-		for interaction in interactions: 
+		return inferred_edges_df
 
-			if   interaction == 'phosphorylation':	 edge_attributes.update({ 'effect': 1, 'modification': "+p" })
-			elif interaction == 'dephosphorylation': edge_attributes.update({ 'effect': 1, 'modification': "-p" })
-			elif interaction == 'glycosylation': 	 edge_attributes.update({ 'effect': 1, 'modification': "+g" })
-			elif interaction == 'ubiquitination': 	 edge_attributes.update({ 'effect': 1, 'modification': "+u" })
-			elif interaction == 'methylation': 		 edge_attributes.update({ 'effect': 1, 'modification': "+m" })
 
-		for interaction in interactions: 
+	def _populate_edge_attributes(self, source, target, edge_type, interactions): 
 
-			if   interaction == 'activation': 	   edge_attributes.update({ 'effect':  1 })
-			elif interaction == 'inhibition': 	   edge_attributes.update({ 'effect': -1 })
-			elif interaction == 'expression': 	   edge_attributes.update({ 'effect':  1, 'modification': 'e'})
-			elif interaction == 'repression': 	   edge_attributes.update({ 'effect': -1, 'modification': 'e'})
-			else: pass
+		# Edges are returned as tuples ordered like `self.edge_columns`, which is cheaper than a dict per edge
+		effect, indirect, modification = _resolve_interactions(tuple(interactions))
 
-		return edge_attributes
+		return (source, target, effect, indirect, modification, edge_type)
 
 
 	def _get_edge_attributes_from_reactions(self): 
 
 		reaction_attributes_list = []
 
-		for reaction in self._reactions: 
+		# Every reaction edge is an activation, so its attributes are resolved once and edge tuples are built directly
+		effect, indirect, modification = _resolve_interactions(('activation',))
 
-			compound_id, reaction_name, reaction_type = reaction.get('id'), reaction.get('name'), reaction.get('type')
-			substrate_ids = [substrate.get('id') for substrate in reaction.findall('substrate')]
-			product_ids   = [product.get('id')   for product   in reaction.findall('product')]
+		for compound_id, reaction_name, reaction_type, substrate_ids, product_ids in self._reactions: 
 
 			# Add substrate-compound interactions first 
-			for substrate_id in substrate_ids: 
-
-				if reaction_type == 'irreversible': 
-					reaction_attributes_list.append(self._populate_edge_attributes(substrate_id, compound_id, reaction_name, ['activation']))
-				else: 
-					reaction_attributes_list.append(self._populate_edge_attributes(compound_id, substrate_id, reaction_name, ['activation']))
+			if reaction_type == 'irreversible': 
+				reaction_attributes_list.extend((substrate_id, compound_id, effect, indirect, modification, reaction_name) for substrate_id in substrate_ids)
+			else: 
+				reaction_attributes_list.extend((compound_id, substrate_id, effect, indirect, modification, reaction_name) for substrate_id in substrate_ids)
 
 			# Add compound-product interactions next
-			for product_id in product_ids: 
-				
-				reaction_attributes_list.append(self._populate_edge_attributes(compound_id, product_id, reaction_name, ['activation']))
+			reaction_attributes_list.extend((compound_id, product_id, effect, indirect, modification, reaction_name) for product_id in product_ids)
 
 		return reaction_attributes_list
 
@@ -251,22 +547,20 @@ class KEGG:
 
 		relation_attributes_list = []
 
-		for relation in self._relations: 
+		for source, target, edge_type, subtypes in self._relations: 
 
-			source, target = relation.get('entry1'), relation.get('entry2')
-			edge_type = relation.get('type')
-			edge_descriptors = [subtype.get('name') for subtype in relation.findall('subtype')]
+			edge_descriptors = [name for name,_ in subtypes]
 
 			# TODO: add support for maplinks?
-			if edge_type in [ 'ECrel', 'PPrel', 'GErel', 'PCrel' ]: 
+			if edge_type in RELATION_TYPES: 
 
 				if 'compound' not in edge_descriptors: 
 
 					relation_attributes_list.append(self._populate_edge_attributes(source, target, edge_type, edge_descriptors))
 
 				else: 
-					# Get compound id by first searching through subtypes with `name` attribute equal to 'compound', then retrieving 'value'
-					compound_id = relation.find('.//subtype[@name="compound"]').get('value')
+					# Get compound id from the `value` of the first subtype with `name` equal to 'compound'
+					compound_id = subtypes[edge_descriptors.index('compound')][1]
 
 					relation_attributes_list.append(self._populate_edge_attributes(source, compound_id, edge_type, edge_descriptors))
 					relation_attributes_list.append(self._populate_edge_attributes(compound_id, target, edge_type, edge_descriptors))
@@ -274,30 +568,69 @@ class KEGG:
 		return relation_attributes_list
 
 
-	def _replace_group_edges(self, edge_attributes_df):
+	def _replace_group_edges(self, edge_values):
+		"""
+		Replaces edges to or from a group with edges to or from each of its members, and adds `PComplex` 
+		edges between members. Groups are processed in order, since edges between two groups, and groups nested in 
+		other groups, are expanded by each group in turn. 
+
+		Arguments: 
+			edge_values (numpy.ndarray): object array of edges, with columns ordered like `self.edge_columns`
+
+		Returns: 
+			numpy.ndarray: edges with groups replaced
+		"""
+
+		# Complexed proteins are essentially `binding/association`; attributes are the same for every member pair
+		effect, indirect, modification = _resolve_interactions(('protein complex',))
+
+		# Node ids referenced by each endpoint column. A group is only scanned in the columns that reference it. 
+		endpoint_columns = [self.edge_columns.index('source'), self.edge_columns.index('target')]
+		referenced_ids = { column: set(edge_values[:, column]) for column in endpoint_columns }
+
+		# Edges between group members are held back and appended together, after the edges they would follow. 
+		# They are only appended early if a group to be expanded is one of their members. 
+		pending_rows, pending_ids = [], set()
 
-		for group_element in self._groups: 
+		for group_id, group_members in self._groups: 
 
-			group_id = group_element.get('id')
-			group_members = [component.get('id') for component in group_element.findall('component')]
+			group_members = np.array(group_members, dtype=object)
+
+			if group_id in pending_ids: 
+				pending_edges = np.concatenate(pending_rows)
+				for column in endpoint_columns: 
+					referenced_ids[column].update(pending_edges[:, column])
+				edge_values = np.concatenate([edge_values, pending_edges])
+				pending_rows, pending_ids = [], set()
 
 			# TODO: Make sure these edges haven't been added yet.
 			# Add edges where `node1` or `node2` is a group member
-			for node_type in ['source', 'target']: 
-				edges_with_df	= edge_attributes_df[edge_attributes_df[node_type] == group_id]
-				edges_without_df = edge_attributes_df[edge_attributes_df[node_type] != group_id]
+			for column in endpoint_columns: 
+				if group_id not in referenced_ids[column]: continue
+				is_group_edge = edge_values[:, column] == group_id
+				# Members are now referenced in this column, and may themselves be groups expanded later
+				referenced_ids[column].discard(group_id)
+				referenced_ids[column].update(group_members)
 				# Duplicate rows where `node1` contains the `group_id`
-				expanded_edges_df = pd.concat([edges_with_df]*len(group_members)).sort_index() 
+				expanded_edges = np.repeat(edge_values[is_group_edge], len(group_members), axis=0)
 				# Replace `node` column with repeating list of `group_members`
-				expanded_edges_df[node_type] = group_members*len(edges_with_df)
-				# Concatenate the new dataframes and reset index
-				edge_attributes_df = pd.concat([expanded_edges_df, edges_without_df]).reset_index(drop=True)
-		
-			# Add edges *between* group members. Complexed proteins are essentially `binding/association`
-			group_rows = [ self._populate_edge_attributes(a, b, 'PComplex', ['protein complex']) for a,b in combinations(group_members, 2) ]
-			edge_attributes_df = edge_attributes_df.append(pd.DataFrame(group_rows, columns=self.edge_columns), ignore_index=True).fillna(0)
+				expanded_edges[:, column] = np.tile(group_members, is_group_edge.sum())
+				# Expanded edges are placed ahead of the remaining edges
+				edge_values = np.concatenate([expanded_edges, edge_values[~is_group_edge]])
 		
-		return edge_attributes_df
+			# Add edges *between* group members. Index pairs from `triu_indices` follow the order of `itertools.combinations`. 
+			sources, targets = np.triu_indices(len(group_members), k=1)
+			group_edges = np.empty((len(sources), len(self.edge_columns)), dtype=object)
+			group_edges[:] = (None, None, effect, indirect, modification, 'PComplex')
+			group_edges[:, endpoint_columns[0]] = group_members[sources]
+			group_edges[:, endpoint_columns[1]] = group_members[targets]
+			if len(group_edges): 
+				pending_rows.append(group_edges)
+				pending_ids.update(group_members)
+
+		edge_values = np.concatenate([edge_values] + pending_rows)
+
+		return edge_values
 
 
 	#### OUTPUTS ####
@@ -308,22 +641,18 @@ class KEGG:
 
 	def output_KGML_as_directed_networkx(self, genes_only=True): 
 
-		directed_edge_attributes_df = self._get_directed_edge_attributes_as_dataframe(self.edge_attributes_df)
+		graph = nx.DiGraph()
+		graph.add_edges_from(self._get_directed_edges(self.edge_attributes_df))
 
 		if genes_only: 
 
-			inferred_edge_attributes_df = self._get_directed_edge_attributes_as_dataframe(self.inferred_edge_attributes_df)
-			directed_edge_attributes_df = pd.concat([directed_edge_attributes_df, inferred_edge_attributes_df])
-
-			graph = nx.from_pandas_edgelist(directed_edge_attributes_df, 'source', 'target', edge_attr=True, create_using=nx.DiGraph())
+			graph.add_edges_from(self._get_directed_edges(self.inferred_edge_attributes_df))
 			graph = nx.DiGraph(graph.subgraph(self.node_attributes_df.index[self.node_attributes_df['type'] == 'gene']))
 
-		else: 
-			
-			graph = nx.from_pandas_edgelist(directed_edge_attributes_df, 'source', 'target', edge_attr=True, create_using=nx.DiGraph())
-
+		# Label nodes by name. Entries sharing a name are merged into one node, in node order. 
 		nx.set_node_attributes(graph, self.entry_attributes_df.to_dict('index'))
-		nx.relabel_nodes(graph, { node_id: graph.node[node_id]['name'] for node_id in graph.nodes() }, copy=False)
+		name_map = self.entry_attributes_df['name'].to_dict()
+		nx.relabel_nodes(graph, { node_id: name_map[node_id] for node_id in graph.nodes() }, copy=False)
 		graph.name = self.name
 
 		return graph
@@ -359,11 +688,9 @@ class KEGG:
 			path
 		"""
 
-		# Initialize graph from `edge_attributes_df`, making sure empty dataframes are initialized properly.
-		if len(self.edge_attributes_df) > 0:
-			graph = nx.from_pandas_edgelist(self.edge_attributes_df.fillna(''), 'source', 'target', edge_attr=True, create_using=nx.DiGraph())
-		else: 
-			graph = nx.DiGraph()
+		# Initialize graph from `edge_attributes_df`
+		graph = nx.DiGraph()
+		graph.add_edges_from(self._get_edges(self.edge_attributes_df.fillna('')))
 
 		# Detailed visualization includes singletons as non-gene or compound nodes, such as orthology, titles, etc.
 		if visualize == 'full': 
@@ -374,9 +701,8 @@ class KEGG:
 			graph.name = self.name + '_genes_compounds'
 
 		elif visualize == 'genes': 
-			# Create a graph with inferred edges between genes, then add those edges to graph
-			inferred_edges_graph = nx.from_pandas_edgelist(self._infer_gene_edges_from_reactions(), 'source', 'target', edge_attr=True, create_using=nx.DiGraph())
-			graph = nx.compose(graph, inferred_edges_graph)
+			# Add inferred edges between genes to graph, overwriting the attributes of existing edges
+			graph.add_edges_from(self._get_edges(self.inferred_edge_attributes_df))
 			# Remove any compound nodes by selecting only genes
 			graph = nx.DiGraph(graph.subgraph(self.node_attributes_df.index[self.node_attributes_df['type'] == 'gene']))
 			graph.name = self.name + '_genes_only'
@@ -394,6 +720,10 @@ class KEGG:
 
 	def view(self, scale=1, show_compounds=False, gene_values=None): 
 
+		# Plotting libraries are only imported when a pathway is drawn
+		from matplotlib.patches import Circle, Rectangle
+		from matplotlib.collections import PatchCollection
+
 		entry_attributes_df = self.entry_attributes_df.replace('', np.nan).dropna(subset=['name'])
 
 		fig, ax = set_grid(
@@ -405,48 +735,68 @@ class KEGG:
 		# Render node shapes
 		if gene_values is not None: 
 			# Lookup list of colors
-			hex_lookup = [color for color in sns.color_palette("coolwarm", 256).as_hex()] + ['#b3b3b3']
+			hex_lookup = _get_gene_palette()
 			# Get lookup index based on gene value and map to gene colors
 			gene_values = gene_values.reindex(entry_attributes_df['name'].unique())
 			rgb_indices = ((gene_values / gene_values.abs().max() + 1) / 2 * 255).fillna(-1).astype(int)
-			gene_colors = { node:hex_lookup[idx] for node,idx in rgb_indices.iteritems() }
+			gene_colors = pd.Series(hex_lookup[rgb_indices.values], index=rgb_indices.index)
 
 		nodes_dic = {node_id:Node(attribs) for node_id,attribs in entry_attributes_df.to_dict('index').items()}
+
+		# Shapes are collected by category and added as one PatchCollection each
+		compound_patches, map_patches, gene_patches, gene_names = [], [], [], []
+
 		for node_id,node in nodes_dic.items(): 
 			if node.shape == 'circle': 
-				ax.add_patch(matplotlib.patches.Circle(xy=node.center, radius=node.width/2, color='k', fill=False))
+				compound_patches.append(Circle(xy=node.center, radius=node.width/2))
 				if show_compounds: 
 					ax.text(x=node.anchor[0], y=node.anchor[1]+1, s=node.name, fontsize = 6 * scale, ha='center', va='center')
 			elif node.shape == 'roundrectangle': 
-				ax.add_patch(matplotlib.patches.Rectangle(xy=node.anchor, width=node.width, height=node.height, color='grey', fill=True))
+				map_patches.append(Rectangle(xy=node.anchor, width=node.width, height=node.height))
 				ax.text(x=node.center[0], y=node.center[1]+1, s=node.name[6:] if node.name.startswith('TITLE:') else node.name, fontsize = 6 * scale, ha='center', va='center', wrap=True)
 			else: 
-				# ax.add_patch(matplotlib.patches.Rectangle(xy=node.anchor, width=node.width, height=node.height, color='k', fill=False))
-				if gene_values is not None: 
-					facecolor = gene_colors[node.name]
-				else: 
-					facecolor = '#b3b3b3'
-
-				ax.add_patch(matplotlib.patches.Rectangle(xy=node.anchor, width=node.width, height=node.height, ec='k', fc=facecolor))
+				gene_patches.append(Rectangle(xy=node.anchor, width=node.width, height=node.height))
+				gene_names.append(node.name)
 				ax.text(x=node.center[0], y=node.center[1]+1, s=node.name, fontsize = 6 * scale, ha='center', va='center')
 
+		ax.add_collection(PatchCollection(compound_patches, facecolors='none', edgecolors='k'))
+		ax.add_collection(PatchCollection(map_patches, facecolors='grey', edgecolors='grey'))
+		if gene_values is not None: 
+			gene_facecolors = gene_colors.loc[gene_names].tolist()
+		else: 
+			gene_facecolors = ['#b3b3b3'] * len(gene_names)
+
+		ax.add_collection(PatchCollection(gene_patches, facecolors=gene_facecolors, edgecolors='k'))
+
 
 		# Render edges
-		for _,edge_attribs in self.edge_attributes_df.iterrows(): 
-			# Get source and target positions for arrow
-			source_pos, target_pos = shortest_arrow(nodes_dic[edge_attribs['source']], nodes_dic[edge_attribs['target']])
+		# Get source and target positions for all arrows at once from arrays of node geometries
+		sides = node_sides(
+			x = entry_attributes_df['x'].values, 
+			y = entry_attributes_df['y'].values, 
+			width = entry_attributes_df['width'].values, 
+			height = entry_attributes_df['height'].values, 
+			is_circle = (entry_attributes_df['shape'] == 'circle').values
+		)
+		source_indices = entry_attributes_df.index.get_indexer(self.edge_attributes_df['source'])
+		target_indices = entry_attributes_df.index.get_indexer(self.edge_attributes_df['target'])
+		if (source_indices < 0).any() or (target_indices < 0).any(): 
+			raise KeyError('Edges reference entries that are not displayed.')
+		source_positions, target_positions = shortest_arrows(sides[source_indices], sides[target_indices])
 
+		edge_columns = ['effect', 'indirect', 'modification']
+		for source_pos, target_pos, (effect, indirect, modification) in zip(source_positions, target_positions, self.edge_attributes_df[edge_columns].itertuples(index=False, name=None)): 
 
 			arrowprops = dict(color='k')
-			if edge_attribs['indirect'] == 1: arrowprops['linestyle'] = '--'
-			elif edge_attribs['indirect'] == 0: arrowprops['linestyle'] = '-'
+			if indirect == 1: arrowprops['linestyle'] = '--'
+			elif indirect == 0: arrowprops['linestyle'] = '-'
 			else: arrowprops['linestyle'] = '-'
 
-			if edge_attribs['effect'] == 1:
+			if effect == 1:
 				arrowprops['arrowstyle'] = '-|>'
-			elif edge_attribs['effect'] == 2: 
+			elif effect == 2: 
 				arrowprops['arrowstyle'] = '<|-|>'
-			elif edge_attribs['effect'] == -1: 
+			elif effect == -1: 
 				arrowprops['arrowstyle'] = '|-|, widthA=0, widthB=0.5'
 				arrowprops['shrinkB'] = 10
 			else: 
@@ -455,13 +805,32 @@ class KEGG:
 			arrow = ax.annotate('', xy=target_pos, xytext=source_pos, arrowprops=arrowprops)
 
 			# Arrow modification annotation
-			if edge_attribs['modification'] != '': 
+			if modification != '': 
 				midpoint = (source_pos + target_pos) / 2
-				ax.text(x=midpoint[0], y=midpoint[1] - 5, s=edge_attribs['modification'], color='red', ha='center', va='center', fontsize=6*scale)
+				ax.text(x=midpoint[0], y=midpoint[1] - 5, s=modification, color='red', ha='center', va='center', fontsize=6*scale)
 
 		return fig, ax
 
 
+def _load_KGML_file(KGML_file): 
+	"""
+	Worker for `KEGG.from_files`. The attribute DataFrames are computed in the worker, since they are 
+	otherwise only built on first access, which would happen back in the parent process. 
+
+	Arguments: 
+		KGML_file (str): path to a KGML file
+
+	Returns: 
+		KEGG
+	"""
+
+	pathway = KEGG(KGML_file=KGML_file)
+	for attribute in ['entry_attributes_df', 'node_attributes_df', 'edge_attributes_df', 'inferred_edge_attributes_df']: 
+		getattr(pathway, attribute)
+
+	return pathway
+
+
 def output_DiGraph_as_graphml(graph, path): 
 	"""
 	Removes bidirectional edges from networkx DiGraph for visualization in Cytoscape. 
@@ -18,11 +18,12 @@ setup(
     author_email='iamjli@mit.edu',
     description='Python package for manipulation and visualization of KEGG pathways.',
     install_requires=[
-        "pandas>=0.20.1", 
-        "numpy>=1.12.0",
+        "pandas>=0.24.0", 
+        "numpy>=1.15.0",
         "networkx>=2.0",
         "matplotlib==2.0.0", 
         "seaborn", 
-        "requests"
+        "requests", 
+        "lxml"
     ]
 )
\ No newline at end of file
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+
+import os
+import unittest
+import xml.etree.ElementTree
+
+from unittest import mock
+
+import networkx as nx
+
+from keggx import KEGG
+from keggx import keggx
+
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+
+NESTED_GROUPS_FILE   = os.path.join(DATA_DIR, 'nested_groups.xml')
+DUPLICATE_NAMES_FILE = os.path.join(DATA_DIR, 'duplicate_names.xml')
+EMPTY_FILE           = os.path.join(DATA_DIR, 'empty.xml')
+
+EDGE_COLUMNS = ['source', 'target', 'effect', 'indirect', 'modification', 'type']
+
+# Expected values below were produced by keggx 0.1.0 on the same files
+
+
+def edge_rows(edge_attributes_df):
+	return [tuple(row) for row in edge_attributes_df[EDGE_COLUMNS].astype(object).values.tolist()]
+
+
+def graph_edges(graph):
+	return [(source, target) + tuple(attributes[column] for column in EDGE_COLUMNS[2:]) for source,target,attributes in graph.edges(data=True)]
+
+
+class TestGroups(unittest.TestCase):
+
+	def test_nested_groups_are_expanded(self):
+
+		pathway = KEGG(KGML_file=NESTED_GROUPS_FILE)
+
+		# Group 10 contains group 11, and relations link groups to genes and to each other
+		self.assertEqual(edge_rows(pathway.edge_attributes_df), [
+			('3', '3', 2, 0, '', 'PPrel'), ('3', '4', 2, 0, '', 'PPrel'), ('4', '3', 2, 0, '', 'PPrel'), ('4', '4', 2, 0, '', 'PPrel'),
+			('1', '3', 2, 0, '', 'PPrel'), ('1', '4', 2, 0, '', 'PPrel'), ('2', '3', 2, 0, '', 'PPrel'), ('2', '4', 2, 0, '', 'PPrel'),
+			('5', '3', -1, 0, '', 'PPrel'), ('5', '4', -1, 0, '', 'PPrel'),
+			('1', '3', 2, 0, '', 'PComplex'), ('1', '4', 2, 0, '', 'PComplex'), ('2', '3', 2, 0, '', 'PComplex'), ('2', '4', 2, 0, '', 'PComplex'),
+			('3', '5', 1, 0, '', 'PPrel'), ('4', '5', 1, 0, '', 'PPrel'), ('1', '5', 1, 0, '', 'PPrel'), ('2', '5', 1, 0, '', 'PPrel'),
+			('1', '5', 2, 0, '', 'PComplex'), ('1', '2', 2, 0, '', 'PComplex'), ('3', '4', 2, 0, '', 'PComplex')
+		])
+
+	def test_group_ids_are_not_edge_endpoints(self):
+
+		pathway = KEGG(KGML_file=NESTED_GROUPS_FILE)
+		edge_attributes_df = pathway.edge_attributes_df
+
+		self.assertFalse(edge_attributes_df['source'].isin(['10', '11', '12']).any())
+		self.assertFalse(edge_attributes_df['target'].isin(['10', '11', '12']).any())
+
+
+class TestDuplicateNames(unittest.TestCase):
+
+	def setUp(self):
+		self.pathway = KEGG(KGML_file=DUPLICATE_NAMES_FILE)
+
+	def test_entries(self):
+
+		entry_attributes_df = self.pathway.entry_attributes_df
+
+		self.assertEqual(entry_attributes_df.index.tolist(), ['1', '2', '3', '4', '5', '6', '7', '8'])
+		self.assertEqual(entry_attributes_df['name'].tolist(), ['A', 'B', 'B', 'C', 'ATP', 'ADP', 'TITLE:Other pathway', ''])
+		self.assertEqual(entry_attributes_df['aliases'].tolist(), [
+			'A, ALIAS_A...', 'B, ALIAS_B', 'B...', 'C', "ATP; Adenosine 5'-triphosphate", "ADP; Adenosine 5'-diphosphate", 'TITLE:Other pathway', ''
+		])
+
+	def test_edges(self):
+
+		self.assertEqual(edge_rows(self.pathway.edge_attributes_df), [
+			('1', '3', 2, 0, '', 'PPrel'), ('1', '4', 2, 0, '', 'PPrel'),
+			('5', '2', 1, 0, '', 'rn:R00001'), ('2', '6', 1, 0, '', 'rn:R00001'), ('1', '6', 1, 0, '', 'rn:R00002'), ('1', '5', 1, 0, '', 'rn:R00002'),
+			('1', '2', 1, 0, '+p', 'PPrel'), ('1', '3', -1, 0, '', 'PPrel'), ('5', '4', 0, 0, '', 'PCrel'), ('4', '1', 1, 1, 'e', 'GErel'),
+			('3', '4', 2, 0, '', 'PComplex')
+		])
+		self.assertEqual(edge_rows(self.pathway.inferred_edge_attributes_df), [('1', '2', 1, 0, '', 'inferred_rxn')])
+
+	# networkx < 3 relabels nodes in set order, so which merged edge wins is only defined from networkx 3 on
+	@unittest.skipIf(int(nx.__version__.split('.')[0]) < 3, 'requires networkx>=3')
+	def test_directed_networkx_merges_entries_in_node_order(self):
+
+		graph = self.pathway.output_KGML_as_directed_networkx(genes_only=True)
+		self.assertEqual(list(graph.nodes()), ['A', 'B', 'C'])
+		self.assertEqual(graph_edges(graph), [
+			('A', 'B', 1, 0, '', 'inferred_rxn'), ('A', 'C', 2, 0, '', 'PPrel'), ('B', 'A', 2, 0, '', 'PPrel'),
+			('B', 'C', 2, 0, '', 'PComplex'), ('C', 'A', 2, 0, '', 'PPrel'), ('C', 'B', 2, 0, '', 'PComplex')
+		])
+
+		graph = self.pathway.output_KGML_as_directed_networkx(genes_only=False)
+		self.assertEqual(list(graph.nodes()), ['A', 'B', 'C', 'ATP', 'ADP'])
+		self.assertEqual(graph_edges(graph), [
+			('A', 'B', 1, 0, '+p', 'PPrel'), ('A', 'C', 2, 0, '', 'PPrel'), ('A', 'ATP', 1, 0, '', 'rn:R00002'), ('A', 'ADP', 1, 0, '', 'rn:R00002'),
+			('B', 'A', 2, 0, '', 'PPrel'), ('B', 'C', 2, 0, '', 'PComplex'), ('B', 'ADP', 1, 0, '', 'rn:R00001'),
+			('C', 'A', 2, 0, '', 'PPrel'), ('C', 'B', 2, 0, '', 'PComplex'), ('C', 'ATP', 0, 0, '', 'PCrel'),
+			('ATP', 'C', 0, 0, '', 'PCrel'), ('ATP', 'B', 1, 0, '', 'rn:R00001')
+		])
+
+	@unittest.skipIf(int(nx.__version__.split('.')[0]) < 3, 'requires networkx>=3')
+	def test_directed_edges(self):
+
+		edge_attributes_df = self.pathway.get_directed_edges_from_KGML()
+		self.assertEqual(edge_rows(edge_attributes_df), graph_edges(self.pathway.output_KGML_as_directed_networkx()))
+		self.assertEqual(set(edge_attributes_df['pathway']), {'path:test00002'})
+
+
+# keggx 0.1.0 failed on pathways without entries
+class TestEmptyPathway(unittest.TestCase):
+
+	def test_empty_pathway(self):
+
+		pathway = KEGG(KGML_file=EMPTY_FILE)
+
+		self.assertEqual([pathway.name, pathway.org, pathway.number, pathway.title, pathway.link], ['path:test00004', 'test', '00004', 'Empty', 'http://example.org/test00004'])
+		self.assertEqual(len(pathway.entry_attributes_df), 0)
+		self.assertEqual(len(pathway.edge_attributes_df), 0)
+		self.assertEqual(len(pathway.inferred_edge_attributes_df), 0)
+		self.assertEqual(len(pathway.output_KGML_as_directed_networkx()), 0)
+		self.assertEqual(len(pathway.G_kegg), 0)
+
+
+class TestInputs(unittest.TestCase):
+
+	def assertSamePathway(self, pathway, expected):
+
+		self.assertEqual(pathway.name, expected.name)
+		self.assertTrue(pathway.entry_attributes_df.equals(expected.entry_attributes_df))
+		self.assertTrue(pathway.edge_attributes_df.equals(expected.edge_attributes_df))
+
+	def check_inputs(self):
+
+		for KGML_file in [NESTED_GROUPS_FILE, DUPLICATE_NAMES_FILE, EMPTY_FILE]:
+
+			expected = KEGG(KGML_file=KGML_file)
+
+			with open(KGML_file) as text_file:
+				self.assertSamePathway(KEGG(KGML_file=text_file), expected)
+			with open(KGML_file, 'rb') as binary_file:
+				self.assertSamePathway(KEGG(KGML_file=binary_file), expected)
+
+	@unittest.skipIf(keggx.ET.__name__ != 'lxml.etree', 'requires lxml')
+	def test_file_objects_with_lxml(self):
+		self.check_inputs()
+
+	def test_file_objects_with_stdlib_parser(self):
+
+		with mock.patch.object(keggx, 'ET', xml.etree.ElementTree):
+			self.check_inputs()
+
+	def test_parsers_agree(self):
+
+		for KGML_file in [NESTED_GROUPS_FILE, DUPLICATE_NAMES_FILE, EMPTY_FILE]:
+			with mock.patch.object(keggx, 'ET', xml.etree.ElementTree):
+				expected = KEGG(KGML_file=KGML_file)
+			self.assertSamePathway(KEGG(KGML_file=KGML_file), expected)
+
+
+if __name__ == '__main__':
+	unittest.main()